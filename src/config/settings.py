@@ -9,6 +9,9 @@ import logging
 # Load environment variables from .env file
 load_dotenv()
 
+# Project root, relative paths are resolved against it instead of the working directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 class Settings:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
@@ -25,6 +28,14 @@ class Settings:
         # Keyboard Configuration
         self.hotkey_combination = "ctrl+shift"
         
+        # Profiling Configuration (can also be toggled at runtime)
+        self.profiling_enabled = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+        self.profiling_output_dir = os.path.join(BASE_DIR, os.getenv("PROFILING_DIR", "profiles"))
+        self.profiling_interval = 0.005  # 5ms sampling interval
+        self.profiling_toggle_file = os.path.join(BASE_DIR, "whisper_profiling.on")  # Created/removed to toggle profiling
+        self.profiling_max_samples = 100000  # Upper limit of stack samples per utterance
+        self.profiling_max_duration = 120.0  # Upper limit of seconds sampled per utterance
+        
         # Logging Configuration
         self.log_level = logging.INFO
         self.log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -14,6 +14,7 @@ from services.keyboard_service import KeyboardService
 from services.audio_service import AudioService
 from services.transcription_service import TranscriptionService
 from services.text_injection_service import TextInjectionService
+from services.profiling_service import ProfilingService
 
 class WhisperTranscribers:
     def __init__(self):
@@ -23,12 +24,21 @@ class WhisperTranscribers:
         self.logger = logging.getLogger(__name__)
         
         # Initialize services
-        self.audio_service = AudioService()
+        self.profiling_service = ProfilingService(
+            enabled=self.settings.profiling_enabled,
+            output_dir=self.settings.profiling_output_dir,
+            interval=self.settings.profiling_interval,
+            toggle_file=self.settings.profiling_toggle_file,
+            max_samples=self.settings.profiling_max_samples,
+            max_duration=self.settings.profiling_max_duration
+        )
+        self.audio_service = AudioService(profiling_service=self.profiling_service)
         self.transcription_service = TranscriptionService(self.settings.openai_api_key)
         self.text_injection_service = TextInjectionService()
         self.keyboard_service = KeyboardService(
             on_hotkey_press=self._on_recording_start,
-            on_hotkey_release=self._on_recording_stop
+            on_hotkey_release=self._on_recording_stop,
+            profiling_service=self.profiling_service
         )
         
         # State management
@@ -49,6 +59,9 @@ class WhisperTranscribers:
             print("🛑 Zum Beenden: Ctrl + C")
             print("=" * 60)
             
+            # Allow toggling profiling without a restart
+            self.profiling_service.install_signal_handler()
+            
             # Start keyboard listener
             self.keyboard_service.start_listening()
             
@@ -81,6 +94,7 @@ class WhisperTranscribers:
         """Main application loop"""
         try:
             while self.is_running:
+                self.profiling_service.poll_toggle_file()
                 time.sleep(0.1)  # Small delay to prevent high CPU usage
         except KeyboardInterrupt:
             pass
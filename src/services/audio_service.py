@@ -13,11 +13,12 @@ import numpy as np
 from typing import Optional
 
 class AudioService:
-    def __init__(self):
+    def __init__(self, profiling_service=None):
         self.recording_data = []
         self.is_recording = False
         self.temp_file_path: Optional[str] = None
         self.logger = logging.getLogger(__name__)
+        self.profiling_service = profiling_service
         
         # Audio settings
         self.channels = 1
@@ -36,7 +37,7 @@ class AudioService:
             self.logger.info("Audio recording started")
             
             # Start recording in separate thread
-            self.recording_thread = threading.Thread(target=self._record_audio, daemon=True)
+            self.recording_thread = threading.Thread(target=self._record_audio, name="audio-recording", daemon=True)
             self.recording_thread.start()
             
         except Exception as e:
@@ -78,13 +79,20 @@ class AudioService:
                 if self.is_recording:
                     self.recording_data.extend(indata.copy())
             
+            if self.profiling_service:
+                audio_callback = self.profiling_service.time_callback("audio_callback", audio_callback)
+            
             # Start recording with sounddevice
             with sd.InputStream(
                 samplerate=self.rate,
                 channels=self.channels,
                 dtype=self.dtype,
                 callback=audio_callback
-            ):
+            ) as stream:
+                # A callback running longer than the stream latency risks an input overflow
+                if self.profiling_service:
+                    self.profiling_service.set_callback_threshold("audio_callback", stream.latency)
+                
                 while self.is_recording:
                     sd.sleep(100)  # Sleep for 100ms
                     
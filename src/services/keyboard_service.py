@@ -9,7 +9,7 @@ from typing import Callable, Optional
 import logging
 
 class KeyboardService:
-    def __init__(self, on_hotkey_press: Callable, on_hotkey_release: Callable):
+    def __init__(self, on_hotkey_press: Callable, on_hotkey_release: Callable, profiling_service=None):
         self.on_hotkey_press = on_hotkey_press
         self.on_hotkey_release = on_hotkey_release
         self.listener: Optional[keyboard.Listener] = None
@@ -17,13 +17,23 @@ class KeyboardService:
         self.ctrl_pressed = False
         self.shift_pressed = False
         self.logger = logging.getLogger(__name__)
+        self.profiling_service = profiling_service
+        self.profiling_session = None
         
     def start_listening(self):
         """Start listening for global keyboard events"""
         try:
+            on_press = self._on_key_press
+            on_release = self._on_key_release
+            
+            # Record hook execution times while profiling is active
+            if self.profiling_service:
+                on_press = self.profiling_service.time_callback("keyboard_hook", on_press)
+                on_release = self.profiling_service.time_callback("keyboard_hook", on_release)
+            
             self.listener = keyboard.Listener(
-                on_press=self._on_key_press,
-                on_release=self._on_key_release
+                on_press=on_press,
+                on_release=on_release
             )
             self.listener.start()
             self.logger.info("Keyboard listener started - Waiting for Ctrl+Shift...")
@@ -56,7 +66,12 @@ class KeyboardService:
                 self.is_recording = True
                 self.logger.info("Hotkey activated - Starting recording")
                 print("🔴 Aufnahme gestartet...")
-                threading.Thread(target=self.on_hotkey_press, daemon=True).start()
+                
+                # Start the utterance profile here, press and release hooks run in order on this thread
+                if self.profiling_service:
+                    self.profiling_session = self.profiling_service.begin_utterance()
+                
+                threading.Thread(target=self.on_hotkey_press, name="hotkey-press", daemon=True).start()
                 
         except Exception as e:
             self.logger.error(f"Error in key press handler: {e}")
@@ -77,7 +92,21 @@ class KeyboardService:
                 self.is_recording = False
                 self.logger.info("Hotkey released - Stopping recording")
                 print("⏹️ Aufnahme beendet - Transkribiere...")
-                threading.Thread(target=self.on_hotkey_release, daemon=True).start()
+                threading.Thread(
+                    target=self._handle_hotkey_release,
+                    args=(self.profiling_session,),
+                    name="hotkey-release",
+                    daemon=True
+                ).start()
+                self.profiling_session = None
                 
         except Exception as e:
-            self.logger.error(f"Error in key release handler: {e}") 
\ No newline at end of file
+            self.logger.error(f"Error in key release handler: {e}") 
+    
+    def _handle_hotkey_release(self, profiling_session):
+        """Run the release callback and write the profile of its utterance"""
+        try:
+            self.on_hotkey_release()
+        finally:
+            if self.profiling_service:
+                self.profiling_service.end_utterance(profiling_session)
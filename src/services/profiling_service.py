@@ -0,0 +1,422 @@
+"""
+Profiling Service - On-demand runtime profiling of the dictation pipeline
+Samples the stacks of all threads while an utterance is processed and
+records execution times of the audio and keyboard callbacks
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import marshal
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class CallbackTimer:
+    """Collects execution-time statistics for a frequently called callback"""
+
+    def __init__(self, name: str, slow_threshold: Optional[float] = None):
+        self.name = name
+        self.slow_threshold = slow_threshold  # Deadline in seconds, None if the callback has none
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear all collected timings"""
+        with self._lock:
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+            self.slow = 0  # Calls slower than slow_threshold
+
+    def record(self, duration: float):
+        """Record a single callback execution time in seconds"""
+        with self._lock:
+            self.count += 1
+            self.total += duration
+            if duration > self.max:
+                self.max = duration
+            if self.slow_threshold is not None and duration > self.slow_threshold:
+                self.slow += 1
+
+    def summary(self) -> dict:
+        """Return the collected timings in milliseconds"""
+        with self._lock:
+            summary = {
+                "calls": self.count,
+                "total_ms": round(self.total * 1000, 3),
+                "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+                "max_ms": round(self.max * 1000, 3),
+            }
+            if self.slow_threshold is not None:
+                summary["slow_threshold_ms"] = round(self.slow_threshold * 1000, 3)
+                summary["slow_calls"] = self.slow
+            return summary
+
+
+class ProfilingSession:
+    """Samples all threads for a single utterance, with its own buffers and stop event"""
+
+    def __init__(self, prefix: str, interval: float, max_samples: int, max_duration: float,
+                 callback_thresholds: Dict[str, Optional[float]], timer_granularity: float = 0.0):
+        self.prefix = prefix
+        self.interval = interval
+        self.max_samples = max_samples
+        self.max_duration = max_duration
+        self.logger = logging.getLogger(__name__)
+
+        self.frames: List[Tuple[str, int, str]] = []
+        self.frame_index: Dict[Tuple[str, int, str], int] = {}
+        self.samples: List[Tuple[int, Tuple[int, ...], float]] = []
+        self.thread_names: Dict[int, str] = {}
+        # One switch interval of lag is normal with a CPU-bound thread, longer means the GIL
+        # was not handed over at a regular switch (e.g. held by a long C call)
+        self.sampler_lag = CallbackTimer("sampler_lag", 2 * sys.getswitchinterval())
+        self.callback_timers = {
+            name: CallbackTimer(name, threshold) for name, threshold in callback_thresholds.items()
+        }
+        self.timer_granularity = timer_granularity
+        self.wakeups = 0
+        self.truncated = False
+
+        self.start_time = 0.0
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the sampler thread"""
+        self.start_time = time.perf_counter()
+        self.thread = threading.Thread(target=self._sample_loop, name="profiling-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 2.0) -> float:
+        """Stop the sampler thread and return the session duration"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+            if self.thread.is_alive():
+                self.logger.warning("Profiling sampler did not stop in time, writing a snapshot")
+        return time.perf_counter() - self.start_time
+
+    def timer(self, name: str) -> CallbackTimer:
+        """Return the callback timer for the given name"""
+        timer = self.callback_timers.get(name)
+        if timer is None:
+            timer = self.callback_timers.setdefault(name, CallbackTimer(name))
+        return timer
+
+    def _sample_loop(self):
+        """Periodically capture the stacks of all other threads"""
+        own_ident = threading.get_ident()
+        last = self.start_time
+
+        while True:
+            due = time.perf_counter() + self.interval
+            if self.stop_event.wait(self.interval):
+                break
+            now = time.perf_counter()
+            self.wakeups += 1
+
+            # Waking up later than the timer granularity allows means another thread held the GIL
+            self.sampler_lag.record(max(now - due - self.timer_granularity, 0.0))
+
+            # Each sample stands for the wall-clock time since the previous one
+            elapsed = now - last
+            last = now
+
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                self.samples.append((ident, self._intern_stack(frame), elapsed))
+                if ident not in self.thread_names:
+                    self.thread_names[ident] = self._get_thread_name(ident)
+
+            if len(self.samples) >= self.max_samples or now - self.start_time >= self.max_duration:
+                self.truncated = True
+                self.logger.warning(f"Profiling limit reached, sampling stopped: {self.prefix}")
+                break
+
+    def _intern_stack(self, frame) -> Tuple[int, ...]:
+        """Convert a frame chain into a root-to-leaf tuple of frame indices"""
+        stack = []
+        while frame is not None and len(stack) < 128:
+            code = frame.f_code
+            key = (code.co_filename, code.co_firstlineno, code.co_name)
+            index = self.frame_index.get(key)
+            if index is None:
+                index = len(self.frames)
+                self.frame_index[key] = index
+                self.frames.append(key)
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def _get_thread_name(self, ident: int) -> str:
+        """Look up a readable name for a thread identifier"""
+        for thread in threading.enumerate():
+            if thread.ident == ident:
+                return thread.name
+        return f"Thread-{ident}"
+
+    def write(self, duration: float) -> List[str]:
+        """Write speedscope, per-thread pstats and callback statistics, returns the written paths"""
+        # Snapshot the buffers in case the sampler thread is still running
+        samples = list(self.samples)
+        frames = list(self.frames)
+        thread_names = dict(self.thread_names)
+
+        paths = [self.prefix + ".speedscope.json"]
+        write_speedscope(paths[0], frames, samples, thread_names, duration)
+
+        used_names = set()
+        for ident, name in thread_names.items():
+            safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", name)
+            if safe_name in used_names:
+                safe_name = f"{safe_name}-{ident}"
+            used_names.add(safe_name)
+
+            path = f"{self.prefix}.{safe_name}.pstats"
+            write_pstats(path, frames, [sample for sample in samples if sample[0] == ident])
+            paths.append(path)
+
+        paths.append(self.prefix + ".callbacks.json")
+        self._write_callback_stats(paths[-1], duration, len(samples), thread_names)
+        return paths
+
+    def _write_callback_stats(self, path: str, duration: float, sample_count: int,
+                              thread_names: Dict[int, str]):
+        """Write callback execution times and sampler lag as JSON"""
+        data = {
+            "duration_s": round(duration, 3),
+            "sampling_interval_ms": self.interval * 1000,
+            "sampling_period_ms": round(duration / self.wakeups * 1000, 3) if self.wakeups else 0.0,
+            "timer_granularity_ms": round(self.timer_granularity * 1000, 3),
+            "samples": sample_count,
+            "truncated": self.truncated,
+            "threads": sorted(set(thread_names.values())),
+            "callbacks": {name: timer.summary() for name, timer in self.callback_timers.items()},
+            "sampler_lag": self.sampler_lag.summary(),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+        for name, summary in data["callbacks"].items():
+            self.logger.info(f"Callback {name}: {summary}")
+        self.logger.info(f"Sampler lag (GIL contention): {data['sampler_lag']}")
+
+
+def measure_timer_granularity(interval: float, waits: int = 5) -> float:
+    """Measure how late a wait of the given interval returns while the process is idle"""
+    event = threading.Event()
+    overshoots = []
+    for _ in range(waits):
+        due = time.perf_counter() + interval
+        event.wait(interval)
+        overshoots.append(max(time.perf_counter() - due, 0.0))
+
+    # The smallest overshoot is the timer granularity (about 10 ms on Windows by default)
+    return min(overshoots)
+
+
+def write_speedscope(path: str, frames: List[Tuple[str, int, str]],
+                     samples: List[Tuple[int, Tuple[int, ...], float]],
+                     thread_names: Dict[int, str], duration: float):
+    """Write one sampled profile per thread in speedscope format"""
+    profiles = []
+    for ident, name in thread_names.items():
+        thread_samples = [sample for sample in samples if sample[0] == ident]
+        profiles.append({
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": duration,
+            "samples": [list(stack) for _, stack, _ in thread_samples],
+            "weights": [weight for _, _, weight in thread_samples],
+        })
+
+    data = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "exporter": "hotkey-transcriber",
+        "name": os.path.basename(path),
+        "shared": {
+            "frames": [
+                {"name": func, "file": filename, "line": line}
+                for filename, line, func in frames
+            ]
+        },
+        "profiles": profiles,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def write_pstats(path: str, frames: List[Tuple[str, int, str]],
+                 samples: List[Tuple[int, Tuple[int, ...], float]]):
+    """Write samples in a format readable by pstats.Stats (times are wall-clock)"""
+    stats = {}
+    for _, stack, weight in samples:
+        if not stack:
+            continue
+
+        # Inclusive time is counted once per sample, even for recursion
+        for index in set(stack):
+            entry = stats.setdefault(frames[index], [0, 0, 0.0, 0.0, {}])
+            entry[0] += 1
+            entry[1] += 1
+            entry[3] += weight
+
+        stats[frames[stack[-1]]][2] += weight
+
+        for caller, callee in set(zip(stack, stack[1:])):
+            callers = stats[frames[callee]][4]
+            n, _, tt, ct = callers.get(frames[caller], (0, 0, 0.0, 0.0))
+            callers[frames[caller]] = (n + 1, n + 1, tt, ct + weight)
+
+    with open(path, "wb") as f:
+        marshal.dump({key: tuple(value) for key, value in stats.items()}, f)
+
+
+class ProfilingService:
+    def __init__(self, enabled: bool = False, output_dir: str = "profiles",
+                 interval: float = 0.005, toggle_file: Optional[str] = None,
+                 max_samples: int = 100000, max_duration: float = 120.0):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.interval = interval
+        self.toggle_file = toggle_file
+        self.max_samples = max_samples
+        self.max_duration = max_duration
+        self.logger = logging.getLogger(__name__)
+
+        self._toggle_file_present = False
+        self._lock = threading.Lock()
+        self._active_sessions: Tuple[ProfilingSession, ...] = ()
+        self._utterance_count = 0
+
+        # Measured once at startup, a contended session would hide its own GIL contention
+        self.timer_granularity = measure_timer_granularity(self.interval)
+        self._callback_thresholds: Dict[str, Optional[float]] = {
+            "audio_callback": None,
+            "keyboard_hook": None,
+        }
+
+        if self.enabled:
+            self.logger.info("Profiling enabled at startup")
+
+    @property
+    def is_active(self) -> bool:
+        """True while at least one utterance is being profiled"""
+        return bool(self._active_sessions)
+
+    def install_signal_handler(self):
+        """Toggle profiling with SIGUSR1 (POSIX) or Ctrl+Break (Windows)"""
+        sig = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+        if sig is None:
+            return
+        try:
+            signal.signal(sig, lambda signum, frame: self.toggle())
+            self.logger.info(f"Profiling can be toggled with signal {signal.Signals(sig).name}")
+        except Exception as e:
+            self.logger.error(f"Failed to install profiling signal handler: {e}")
+
+    def toggle(self):
+        """Switch profiling on or off for the following utterances"""
+        self.set_enabled(not self.enabled)
+
+    def set_enabled(self, enabled: bool):
+        """Enable or disable profiling without restarting the application"""
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        self.logger.info(f"Profiling {'enabled' if enabled else 'disabled'}")
+        print(f"📊 Profiling {'aktiviert' if enabled else 'deaktiviert'}")
+
+    def poll_toggle_file(self):
+        """Follow creation/removal of the toggle file (simple IPC from other processes)"""
+        if not self.toggle_file:
+            return
+        present = os.path.exists(self.toggle_file)
+        if present != self._toggle_file_present:
+            self._toggle_file_present = present
+            self.set_enabled(present)
+
+    def set_callback_threshold(self, name: str, slow_threshold: Optional[float]):
+        """Set the deadline after which a call of the named callback counts as slow"""
+        with self._lock:
+            self._callback_thresholds[name] = slow_threshold
+            for session in self._active_sessions:
+                session.timer(name).slow_threshold = slow_threshold
+
+    def time_callback(self, name: str, callback: Callable,
+                      slow_threshold: Optional[float] = None) -> Callable:
+        """Wrap a callback so its execution time is recorded while profiling is active"""
+        if slow_threshold is not None or name not in self._callback_thresholds:
+            self._callback_thresholds[name] = slow_threshold
+
+        def timed_callback(*args, **kwargs):
+            sessions = self._active_sessions
+            if not sessions:
+                return callback(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                for session in sessions:
+                    session.timer(name).record(duration)
+
+        return timed_callback
+
+    def begin_utterance(self) -> Optional[ProfilingSession]:
+        """Start profiling an utterance, returns the session to pass to end_utterance"""
+        if not self.enabled:
+            return None
+        try:
+            with self._lock:
+                self._utterance_count += 1
+                prefix = os.path.join(
+                    self.output_dir,
+                    f"utterance-{time.strftime('%Y%m%d-%H%M%S')}-{self._utterance_count}"
+                )
+                session = ProfilingSession(
+                    prefix, self.interval, self.max_samples, self.max_duration,
+                    dict(self._callback_thresholds), self.timer_granularity
+                )
+                session.start()
+                self._active_sessions = self._active_sessions + (session,)
+
+            self.logger.info(f"Profiling utterance started: {prefix}")
+            return session
+
+        except Exception as e:
+            self.logger.error(f"Failed to start profiling: {e}")
+            return None
+
+    def end_utterance(self, session: Optional[ProfilingSession]) -> Optional[str]:
+        """Stop profiling the given session and write its files, returns their common path prefix"""
+        if session is None:
+            return None
+        try:
+            with self._lock:
+                if session not in self._active_sessions:
+                    return None
+                self._active_sessions = tuple(s for s in self._active_sessions if s is not session)
+
+            duration = session.stop()
+
+            os.makedirs(self.output_dir, exist_ok=True)
+            session.write(duration)
+
+            self.logger.info(f"Profile written: {session.prefix} ({len(session.samples)} samples, {duration:.2f}s)")
+            print(f"📊 Profil gespeichert: {session.prefix}")
+            return session.prefix
+
+        except Exception as e:
+            self.logger.error(f"Failed to write profile: {e}")
+            return None
@@ -0,0 +1,152 @@
+import json
+import pstats
+import threading
+
+import pytest
+
+from services.profiling_service import CallbackTimer, ProfilingService, write_pstats
+
+
+def test_write_pstats_loads_with_expected_times(tmp_path):
+    frames = [("app.py", 1, "outer"), ("app.py", 10, "inner")]
+    samples = [
+        (1, (0, 1), 0.01),
+        (1, (0, 1), 0.01),
+        (1, (0,), 0.02),
+    ]
+    path = tmp_path / "thread.pstats"
+    write_pstats(str(path), frames, samples)
+
+    stats = pstats.Stats(str(path)).stats
+    cc, nc, tt, ct, callers = stats[frames[0]]
+    assert nc == 3
+    assert abs(tt - 0.02) < 1e-9
+    assert abs(ct - 0.04) < 1e-9
+
+    cc, nc, tt, ct, callers = stats[frames[1]]
+    assert nc == 2
+    assert abs(tt - 0.02) < 1e-9
+    assert abs(ct - 0.02) < 1e-9
+    assert callers[frames[0]][0] == 2
+
+
+def test_time_callback_records_only_while_session_active(tmp_path):
+    service = ProfilingService(enabled=True, output_dir=str(tmp_path))
+    callback = service.time_callback("audio_callback", lambda: None)
+
+    callback()
+    session = service.begin_utterance()
+    callback()
+    callback()
+    prefix = service.end_utterance(session)
+    callback()
+
+    assert session.timer("audio_callback").count == 2
+    with open(prefix + ".callbacks.json", encoding="utf-8") as f:
+        assert json.load(f)["callbacks"]["audio_callback"]["calls"] == 2
+
+
+def test_sessions_are_independent_and_stop(tmp_path):
+    service = ProfilingService(enabled=True, output_dir=str(tmp_path), interval=0.001)
+
+    assert service.end_utterance(None) is None
+    first = service.begin_utterance()
+    second = service.begin_utterance()
+    assert first is not second
+
+    assert service.end_utterance(first) == first.prefix
+    assert service.end_utterance(first) is None
+    assert not first.thread.is_alive()
+    assert service.is_active
+
+    service.end_utterance(second)
+    assert not second.thread.is_alive()
+    assert not service.is_active
+
+    with open(first.prefix + ".speedscope.json", encoding="utf-8") as f:
+        data = json.load(f)
+    assert all(profile["type"] == "sampled" for profile in data["profiles"])
+
+
+def test_session_stops_at_sample_limit(tmp_path):
+    service = ProfilingService(enabled=True, output_dir=str(tmp_path), interval=0.001, max_samples=5)
+    session = service.begin_utterance()
+    session.thread.join(timeout=2.0)
+
+    assert not session.thread.is_alive()
+    assert session.truncated
+    service.end_utterance(session)
+
+
+def test_callback_timer_counts_slow_calls_only_with_threshold():
+    timer = CallbackTimer("audio_callback")
+    timer.record(0.5)
+    assert "slow_calls" not in timer.summary()
+
+    timer = CallbackTimer("audio_callback", 0.01)
+    timer.record(0.005)
+    timer.record(0.02)
+    assert timer.summary()["slow_calls"] == 1
+
+
+def test_toggle_file_and_signal_last_toggle_wins(tmp_path):
+    toggle_file = tmp_path / "whisper_profiling.on"
+    service = ProfilingService(enabled=True, output_dir=str(tmp_path), toggle_file=str(toggle_file))
+
+    # A missing file does not override the startup setting
+    service.poll_toggle_file()
+    assert service.enabled
+
+    service.toggle()
+    assert not service.enabled
+
+    toggle_file.touch()
+    service.poll_toggle_file()
+    assert service.enabled
+
+    service.toggle()
+    service.poll_toggle_file()
+    assert not service.enabled
+
+    toggle_file.unlink()
+    service.toggle()
+    service.poll_toggle_file()
+    assert not service.enabled
+    assert service.begin_utterance() is None
+
+
+class StubProfilingService:
+    def __init__(self):
+        self.begun = []
+        self.ended = []
+        self.done = threading.Event()
+
+    def time_callback(self, name, callback, slow_threshold=None):
+        return callback
+
+    def begin_utterance(self):
+        session = object()
+        self.begun.append(session)
+        return session
+
+    def end_utterance(self, session):
+        self.ended.append(session)
+        self.done.set()
+
+
+def test_keyboard_service_profiles_one_utterance_per_hotkey():
+    keyboard = pytest.importorskip("pynput.keyboard")
+    from services.keyboard_service import KeyboardService
+
+    profiling_service = StubProfilingService()
+    service = KeyboardService(lambda: None, lambda: None, profiling_service=profiling_service)
+
+    service._on_key_press(keyboard.Key.ctrl_l)
+    service._on_key_press(keyboard.Key.shift_l)
+    service._on_key_press(keyboard.Key.shift_l)
+    service._on_key_release(keyboard.Key.shift_l)
+    service._on_key_release(keyboard.Key.ctrl_l)
+
+    assert profiling_service.done.wait(timeout=2.0)
+    assert len(profiling_service.begun) == 1
+    assert profiling_service.ended == profiling_service.begun